@@ -2,16 +2,19 @@ import os
 import re
 import time
 import uuid
+import functools
+import threading
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 import logging
-import traceback
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
 import praw
 from dotenv import load_dotenv
+from pybloom_live import ScalableBloomFilter
 
 SUBREDDIT = "Superstonk"
 DB_PATH = "superstonk_dd.sqlite"
@@ -30,17 +33,29 @@ HUB_QUERIES = [
 
 MAX_CRAWL_DEPTH = 3
 MAX_QUEUE_BATCH = 50
+COMMIT_BATCH = 50
 STOP_DUP_STREAK = 2500
 
+CACHE_MB = 64
+SCHEMA_VERSION = 3
+
+BLOOM_INITIAL_CAPACITY = 3_000_000
+BLOOM_ERROR_RATE = 1e-4
+
 SLEEP_SECONDS = 1.1
+MAX_REQUESTS_PER_MINUTE = 60
 HEARTBEAT_EVERY_SECONDS = 30
 
 HUB_COMMENT_SORT = "best"
 HUB_TOP_LEVEL_COMMENTS = 75
 HUB_REPLY_DEPTH = 1
 HUB_MAX_REPLIES_PER_TOP = 20
+HUB_FETCH_WORKERS = 8
 
-URL_RE = re.compile(r"(https?://[^\s)>\]]+)", re.IGNORECASE)
+URL_RE = re.compile(r"https?://[^\s)>\]]+", re.IGNORECASE)
+COMMENTS_ID_RE = re.compile(r"/comments/([a-z0-9]{5,8})", re.IGNORECASE)
+SHORTLINK_ID_RE = re.compile(r"redd\.it/([a-z0-9]{5,8})", re.IGNORECASE)
+KEY_RE = re.compile(r"[a-z0-9]{5,8}")
 
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "dd_autopilot.log")
@@ -50,16 +65,13 @@ def now_utc_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def ts_to_iso(ts: int) -> str:
-    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
-
-
 def extract_urls(text: str):
     if not text:
         return []
-    return list({m.group(1).rstrip(".,;!") for m in URL_RE.finditer(text)})
+    return list({u.rstrip(".,;!") for u in URL_RE.findall(text)})
 
 
+@functools.lru_cache(maxsize=100_000)
 def is_reddit_submission_url(u: str) -> bool:
     try:
         p = urlparse(u)
@@ -81,11 +93,12 @@ def normalize_reddit_url(u: str) -> str:
     return u
 
 
+@functools.lru_cache(maxsize=100_000)
 def submission_id_from_url(u: str):
-    m = re.search(r"/comments/([a-z0-9]{5,8})", u, re.IGNORECASE)
+    m = COMMENTS_ID_RE.search(u)
     if m:
         return m.group(1)
-    m2 = re.search(r"redd\.it/([a-z0-9]{5,8})", u, re.IGNORECASE)
+    m2 = SHORTLINK_ID_RE.search(u)
     if m2:
         return m2.group(1)
     return None
@@ -99,8 +112,43 @@ def deadline_reached(deadline_ts):
     return deadline_ts is not None and time.time() >= deadline_ts
 
 
+class TokenBucket:
+    """Paces Reddit requests to a steady rate instead of a fixed sleep per item.
+
+    Time spent inside PRAW's own network round-trips earns tokens back, so the
+    effective throughput approaches the configured rate rather than
+    sleep + network_rtt per item. Thread-safe so it can be shared across
+    workers without exceeding the global API budget.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 5):
+        self.interval = 60.0 / max(rate_per_minute, 0.001)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+def limiter_from_sleep(sleep_s: float) -> TokenBucket:
+    rate = MAX_REQUESTS_PER_MINUTE if sleep_s <= 0 else min(MAX_REQUESTS_PER_MINUTE, 60.0 / sleep_s)
+    return TokenBucket(rate_per_minute=rate)
+
+
 def setup_logging(verbose=False) -> logging.Logger:
     ensure_dirs()
+    logging.raiseExceptions = False
     logger = logging.getLogger("dd_autopilot")
     logger.setLevel(logging.DEBUG)
     if logger.handlers:
@@ -132,9 +180,17 @@ def init_reddit():
 
 
 def init_db():
-    con = sqlite3.connect(DB_PATH)
+    # isolation_level=None disables the sqlite3 module's implicit
+    # transaction management; batches below open their own BEGIN IMMEDIATE
+    # so writer locks are taken up front instead of on first write.
+    con = sqlite3.connect(DB_PATH, isolation_level=None)
     con.execute("PRAGMA foreign_keys=ON;")
     con.execute("PRAGMA journal_mode=WAL;")
+    con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute(f"PRAGMA cache_size=-{CACHE_MB * 1024};")
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute("PRAGMA mmap_size=2147483648;")
+    con.execute("PRAGMA busy_timeout=5000;")
     return con
 
 
@@ -148,7 +204,6 @@ def apply_schema(con: sqlite3.Connection):
           id TEXT PRIMARY KEY,
           subreddit TEXT NOT NULL,
           created_utc INTEGER NOT NULL,
-          created_iso TEXT NOT NULL,
           title TEXT,
           selftext TEXT,
           score INTEGER,
@@ -157,19 +212,20 @@ def apply_schema(con: sqlite3.Connection):
           url TEXT,
           link_flair_text TEXT,
           author TEXT,
-          retrieved_at_utc TEXT NOT NULL
+          retrieved_at_utc INTEGER NOT NULL
         );
 
         CREATE INDEX IF NOT EXISTS idx_posts_created_utc ON posts(created_utc);
         CREATE INDEX IF NOT EXISTS idx_posts_flair ON posts(link_flair_text);
+        CREATE INDEX IF NOT EXISTS idx_posts_flair_created ON posts(link_flair_text, created_utc);
 
         CREATE TABLE IF NOT EXISTS links (
           post_id TEXT NOT NULL,
           url TEXT NOT NULL,
-          first_seen_utc TEXT NOT NULL,
+          first_seen_utc INTEGER NOT NULL,
           PRIMARY KEY (post_id, url),
           FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
-        );
+        ) WITHOUT ROWID;
 
         CREATE INDEX IF NOT EXISTS idx_links_url ON links(url);
 
@@ -185,7 +241,25 @@ def apply_schema(con: sqlite3.Connection):
           updated_at_utc TEXT NOT NULL
         );
 
-        CREATE INDEX IF NOT EXISTS idx_queue_status ON crawl_queue(status);
+        DROP INDEX IF EXISTS idx_queue_status;
+        CREATE INDEX IF NOT EXISTS idx_queue_ready
+          ON crawl_queue(added_at_utc, key, url, depth, is_hub, max_comment_depth, status)
+          WHERE status='queued';
+
+        CREATE TABLE IF NOT EXISTS posts_daily (
+          day TEXT NOT NULL,
+          flair TEXT NOT NULL,
+          n INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (day, flair)
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS trg_posts_daily_insert
+        AFTER INSERT ON posts
+        BEGIN
+          INSERT INTO posts_daily(day, flair, n)
+          VALUES (date(NEW.created_utc, 'unixepoch'), COALESCE(NEW.link_flair_text, '(none)'), 1)
+          ON CONFLICT(day, flair) DO UPDATE SET n = n + 1;
+        END;
 
         CREATE TABLE IF NOT EXISTS runs (
           run_id TEXT PRIMARY KEY,
@@ -200,38 +274,183 @@ def apply_schema(con: sqlite3.Connection):
         """
     )
     con.commit()
+    migrate_schema(con)
+
+
+def migrate_schema(con: sqlite3.Connection):
+    """One-time rebuilds for databases created by older schema versions."""
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    if version < 1:
+        # Rebuild links as WITHOUT ROWID: the composite PK is the whole row,
+        # so the old hidden rowid + separate PK index just doubled the pages
+        # touched per insert.
+        (links_sql,) = con.execute(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name='links'"
+        ).fetchone()
+        if "WITHOUT ROWID" not in links_sql.upper():
+            con.executescript(
+                """
+                BEGIN;
+                CREATE TABLE links_new (
+                  post_id TEXT NOT NULL,
+                  url TEXT NOT NULL,
+                  first_seen_utc TEXT NOT NULL,
+                  PRIMARY KEY (post_id, url),
+                  FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+                ) WITHOUT ROWID;
+                INSERT INTO links_new SELECT post_id, url, first_seen_utc FROM links;
+                DROP TABLE links;
+                ALTER TABLE links_new RENAME TO links;
+                CREATE INDEX IF NOT EXISTS idx_links_url ON links(url);
+                COMMIT;
+                """
+            )
+
+    if version < 2:
+        # Backfill the posts_daily rollup from existing posts; the trigger
+        # keeps it current from here on.
+        con.executescript(
+            """
+            BEGIN;
+            DELETE FROM posts_daily;
+            INSERT INTO posts_daily(day, flair, n)
+              SELECT date(created_utc, 'unixepoch'), COALESCE(link_flair_text, '(none)'), COUNT(*)
+              FROM posts
+              GROUP BY 1, 2;
+            COMMIT;
+            """
+        )
+
+    if version < 3:
+        # Quantize timestamps to INTEGER epochs: drop the redundant
+        # created_iso column and convert retrieved_at_utc/first_seen_utc
+        # from 26-byte ISO text to epoch ints. FKs are re-pointed by the
+        # renames, so enforcement is paused for the rebuild.
+        (posts_sql,) = con.execute(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name='posts'"
+        ).fetchone()
+        if "created_iso" in posts_sql:
+            con.execute("PRAGMA foreign_keys=OFF;")
+            con.executescript(
+                """
+                BEGIN;
+                CREATE TABLE posts_new (
+                  id TEXT PRIMARY KEY,
+                  subreddit TEXT NOT NULL,
+                  created_utc INTEGER NOT NULL,
+                  title TEXT,
+                  selftext TEXT,
+                  score INTEGER,
+                  num_comments INTEGER,
+                  permalink TEXT,
+                  url TEXT,
+                  link_flair_text TEXT,
+                  author TEXT,
+                  retrieved_at_utc INTEGER NOT NULL
+                );
+                INSERT INTO posts_new
+                  SELECT id, subreddit, created_utc, title, selftext, score, num_comments,
+                         permalink, url, link_flair_text, author,
+                         CAST(strftime('%s', retrieved_at_utc) AS INTEGER)
+                  FROM posts;
+                DROP TABLE posts;
+                ALTER TABLE posts_new RENAME TO posts;
+                CREATE INDEX IF NOT EXISTS idx_posts_created_utc ON posts(created_utc);
+                CREATE INDEX IF NOT EXISTS idx_posts_flair ON posts(link_flair_text);
+                CREATE INDEX IF NOT EXISTS idx_posts_flair_created ON posts(link_flair_text, created_utc);
+
+                CREATE TABLE links_epoch (
+                  post_id TEXT NOT NULL,
+                  url TEXT NOT NULL,
+                  first_seen_utc INTEGER NOT NULL,
+                  PRIMARY KEY (post_id, url),
+                  FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+                ) WITHOUT ROWID;
+                INSERT INTO links_epoch
+                  SELECT post_id, url, CAST(strftime('%s', first_seen_utc) AS INTEGER)
+                  FROM links;
+                DROP TABLE links;
+                ALTER TABLE links_epoch RENAME TO links;
+                CREATE INDEX IF NOT EXISTS idx_links_url ON links(url);
+
+                CREATE TRIGGER trg_posts_daily_insert
+                AFTER INSERT ON posts
+                BEGIN
+                  INSERT INTO posts_daily(day, flair, n)
+                  VALUES (date(NEW.created_utc, 'unixepoch'), COALESCE(NEW.link_flair_text, '(none)'), 1)
+                  ON CONFLICT(day, flair) DO UPDATE SET n = n + 1;
+                END;
+                COMMIT;
+                """
+            )
+            con.execute("PRAGMA foreign_keys=ON;")
+
+    con.execute(f"PRAGMA user_version={SCHEMA_VERSION};")
+    con.commit()
 
 
-def insert_post(con, row) -> bool:
+def warm_seen_filter(con, logger):
+    """Builds a Bloom filter over known post IDs and queue keys.
+
+    A hit skips the whole SQL parse/bind/index-lookup for rows we already
+    have; a false positive only skips a redundant INSERT OR IGNORE.
+    Keys are namespaced because posts and crawl_queue share ID values.
+    """
+    seen = ScalableBloomFilter(initial_capacity=BLOOM_INITIAL_CAPACITY, error_rate=BLOOM_ERROR_RATE)
+    n_posts = 0
+    n_queue = 0
+    for (post_id,) in con.execute("SELECT id FROM posts"):
+        seen.add("post:" + post_id)
+        n_posts += 1
+    for (key,) in con.execute("SELECT key FROM crawl_queue"):
+        seen.add("queue:" + key)
+        n_queue += 1
+    logger.info("Seen-filter warmed. posts=%d queue=%d", n_posts, n_queue)
+    return seen
+
+
+def insert_post(con, row, seen=None) -> bool:
+    if seen is not None:
+        marker = "post:" + row[0]
+        if marker in seen:
+            return False
+        seen.add(marker)
     cur = con.execute(
         """
         INSERT OR IGNORE INTO posts
-        (id, subreddit, created_utc, created_iso, title, selftext, score, num_comments,
+        (id, subreddit, created_utc, title, selftext, score, num_comments,
          permalink, url, link_flair_text, author, retrieved_at_utc)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CAST(strftime('%s','now') AS INTEGER))
         """,
         row,
     )
     return cur.rowcount == 1
 
 
-def upsert_link(con, post_id, url):
-    con.execute("INSERT OR IGNORE INTO links(post_id, url, first_seen_utc) VALUES (?, ?, ?)", (post_id, url, now_utc_iso()))
-
-
-def queue_add(con, key, url, depth, is_hub=0, max_comment_depth=0):
+def queue_add(con, key, url, depth, is_hub=0, max_comment_depth=0, seen=None):
+    if seen is not None:
+        marker = "queue:" + key
+        if marker in seen:
+            return
+        seen.add(marker)
     con.execute(
         """
         INSERT OR IGNORE INTO crawl_queue
         (key, url, depth, status, is_hub, max_comment_depth, added_at_utc, updated_at_utc)
-        VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)
+        VALUES (?, ?, ?, 'queued', ?, ?, strftime('%Y-%m-%dT%H:%M:%fZ','now'), strftime('%Y-%m-%dT%H:%M:%fZ','now'))
         """,
-        (key, url, int(depth), int(is_hub), int(max_comment_depth), now_utc_iso(), now_utc_iso()),
+        (key, url, int(depth), int(is_hub), int(max_comment_depth)),
     )
 
 
 def queue_mark(con, key, status, err=None):
-    con.execute("UPDATE crawl_queue SET status=?, last_error=?, updated_at_utc=? WHERE key=?", (status, err, now_utc_iso(), key))
+    con.execute(
+        "UPDATE crawl_queue SET status=?, last_error=?, updated_at_utc=strftime('%Y-%m-%dT%H:%M:%fZ','now') WHERE key=?",
+        (status, err, key),
+    )
 
 
 def queue_pop_batch(con, batch_size):
@@ -278,44 +497,72 @@ def end_run(con, run_id):
     con.commit()
 
 
-def extract_reddit_links_from_best_comments(submission, top_n, reply_depth, max_replies_per_top):
+def _links_from_top_comment(top, reply_depth, max_replies_per_top, limiter):
+    links = set()
+    for u in extract_urls(getattr(top, "body", "")):
+        if is_reddit_submission_url(u):
+            links.add(normalize_reddit_url(u))
+
+    if reply_depth >= 1:
+        try:
+            if limiter is not None:
+                limiter.acquire()
+            top.replies.replace_more(limit=0)
+            replies = list(top.replies)[:max_replies_per_top]
+            for r in replies:
+                for u in extract_urls(getattr(r, "body", "")):
+                    if is_reddit_submission_url(u):
+                        links.add(normalize_reddit_url(u))
+        except Exception:
+            pass
+
+    return links
+
+
+def extract_reddit_links_from_best_comments(submission, top_n, reply_depth, max_replies_per_top, limiter=None):
     submission.comment_sort = HUB_COMMENT_SORT
+    submission.comment_limit = top_n
     links = set()
-    submission.comments.replace_more(limit=0)
-    top_level = list(submission.comments)[:top_n]
 
-    for top in top_level:
-        for u in extract_urls(getattr(top, "body", "")):
-            if is_reddit_submission_url(u):
-                links.add(normalize_reddit_url(u))
-
-        if reply_depth >= 1:
-            try:
-                top.replies.replace_more(limit=0)
-                replies = list(top.replies)[:max_replies_per_top]
-                for r in replies:
-                    for u in extract_urls(getattr(r, "body", "")):
-                        if is_reddit_submission_url(u):
-                            links.add(normalize_reddit_url(u))
-            except Exception:
-                pass
+    # Take the first top_n already-loaded top-level comments instead of
+    # resolving every MoreComments stub up front; only the selected slice
+    # gets its replies expanded below.
+    top_level = []
+    for top in submission.comments:
+        if len(top_level) >= top_n:
+            break
+        if isinstance(top, praw.models.MoreComments):
+            continue
+        top_level.append(top)
+
+    # Each top comment's reply fetch is independent network I/O, so fan out
+    # across a small pool; the shared token bucket keeps the global request
+    # rate within budget. Only parsing happens here — SQLite writes stay on
+    # the caller's thread.
+    worker = functools.partial(
+        _links_from_top_comment, reply_depth=reply_depth, max_replies_per_top=max_replies_per_top, limiter=limiter
+    )
+    with ThreadPoolExecutor(max_workers=HUB_FETCH_WORKERS) as pool:
+        for found in pool.map(worker, top_level):
+            links |= found
 
     return sorted(links)
 
 
-def store_submission_and_discover(con, submission, depth: int):
+def store_submission_and_discover(con, submission, depth: int, seen=None):
     _ = submission.title
 
     post_id = submission.id
     created_utc = int(submission.created_utc)
     permalink = "https://www.reddit.com" + submission.permalink
-    author = str(submission.author) if submission.author else None
+    # .name comes straight from the submission listing JSON; str() on the
+    # lazy Redditor can trigger an extra /user/.../about fetch.
+    author = submission.author.name if submission.author else None
 
     row = (
         post_id,
         str(submission.subreddit),
         created_utc,
-        ts_to_iso(created_utc),
         submission.title,
         submission.selftext,
         int(submission.score),
@@ -324,32 +571,56 @@ def store_submission_and_discover(con, submission, depth: int):
         submission.url,
         submission.link_flair_text,
         author,
-        now_utc_iso(),
     )
 
-    inserted = insert_post(con, row)
+    inserted = insert_post(con, row, seen=seen)
 
-    urls = []
-    urls += extract_urls(submission.title or "")
-    urls += extract_urls(submission.selftext or "")
-    urls += extract_urls(submission.url or "")
-    urls = sorted(set(urls))
+    # Duplicate post: its links and queue entries were stored when it was
+    # first seen, so skip re-extraction. Hub comment crawling happens
+    # separately in crawl_queue and is unaffected.
+    if not inserted:
+        return False
 
-    for u in urls:
-        upsert_link(con, post_id, u)
-        if depth < MAX_CRAWL_DEPTH and is_reddit_submission_url(u):
-            nu = normalize_reddit_url(u)
-            sid = submission_id_from_url(nu)
-            key = sid if sid else nu
-            queue_add(con, key=key, url=nu, depth=depth + 1)
+    text = "\n".join((submission.title or "", submission.selftext or "", submission.url or ""))
+    urls = sorted({u.rstrip(".,;!") for u in URL_RE.findall(text)})
+
+    now_ts = int(time.time())
+    link_rows = [(post_id, u, now_ts) for u in urls]
+
+    queue_rows = []
+    if depth < MAX_CRAWL_DEPTH:
+        for u in urls:
+            if is_reddit_submission_url(u):
+                nu = normalize_reddit_url(u)
+                sid = submission_id_from_url(nu)
+                key = sid if sid else nu
+                if seen is not None:
+                    marker = "queue:" + key
+                    if marker in seen:
+                        continue
+                    seen.add(marker)
+                queue_rows.append((key, nu, depth + 1, 0, 0))
+
+    if link_rows:
+        con.executemany("INSERT OR IGNORE INTO links(post_id, url, first_seen_utc) VALUES (?, ?, ?)", link_rows)
+    if queue_rows:
+        con.executemany(
+            """
+            INSERT OR IGNORE INTO crawl_queue
+            (key, url, depth, status, is_hub, max_comment_depth, added_at_utc, updated_at_utc)
+            VALUES (?, ?, ?, 'queued', ?, ?, strftime('%Y-%m-%dT%H:%M:%fZ','now'), strftime('%Y-%m-%dT%H:%M:%fZ','now'))
+            """,
+            queue_rows,
+        )
 
     return inserted
 
 
-def ingest_dd_flair_posts(reddit, con, logger, sleep_s, deadline_ts):
+def ingest_dd_flair_posts(reddit, con, logger, limiter, seen, deadline_ts):
     sub = reddit.subreddit(SUBREDDIT)
     inserted_count = 0
-    seen = 0
+    scanned = 0
+    pending = 0
     heartbeat_at = time.time()
 
     for flair in DD_FLAIRS:
@@ -364,11 +635,17 @@ def ingest_dd_flair_posts(reddit, con, logger, sleep_s, deadline_ts):
         for submission in sub.search(query, sort="new", syntax="lucene", limit=None):
             if deadline_reached(deadline_ts):
                 logger.info("Time budget reached mid-flair loop. Stopping safely.")
+                con.commit()
                 return inserted_count
 
-            seen += 1
-            inserted = store_submission_and_discover(con, submission, depth=0)
-            con.commit()
+            scanned += 1
+            if pending == 0:
+                con.execute("BEGIN IMMEDIATE;")
+            inserted = store_submission_and_discover(con, submission, depth=0, seen=seen)
+            pending += 1
+            if pending >= COMMIT_BATCH:
+                con.commit()
+                pending = 0
 
             if inserted:
                 inserted_count += 1
@@ -377,19 +654,23 @@ def ingest_dd_flair_posts(reddit, con, logger, sleep_s, deadline_ts):
                 dup_streak += 1
 
             if time.time() - heartbeat_at >= HEARTBEAT_EVERY_SECONDS:
-                logger.info("Progress | phase=flair | flair=%s | seen=%d | inserted=%d | dup_streak=%d", flair, seen, inserted_count, dup_streak)
+                logger.info("Progress | phase=flair | flair=%s | seen=%d | inserted=%d | dup_streak=%d", flair, scanned, inserted_count, dup_streak)
                 heartbeat_at = time.time()
 
             if dup_streak >= STOP_DUP_STREAK:
                 logger.info("Stopping flair scan due to duplicate streak: %d", dup_streak)
                 break
 
-            time.sleep(sleep_s)
+            limiter.acquire()
+
+        con.commit()
+        pending = 0
 
+    con.commit()
     return inserted_count
 
 
-def discover_hub_posts(reddit, con, logger, sleep_s, deadline_ts):
+def discover_hub_posts(reddit, con, logger, limiter, seen, deadline_ts):
     sub = reddit.subreddit(SUBREDDIT)
     added = 0
     logger.info("Discovering hub posts...")
@@ -407,16 +688,16 @@ def discover_hub_posts(reddit, con, logger, sleep_s, deadline_ts):
 
             _ = submission.title
             permalink = "https://www.reddit.com" + submission.permalink
-            queue_add(con, key=submission.id, url=permalink, depth=0, is_hub=1, max_comment_depth=HUB_REPLY_DEPTH)
+            queue_add(con, key=submission.id, url=permalink, depth=0, is_hub=1, max_comment_depth=HUB_REPLY_DEPTH, seen=seen)
             added += 1
             con.commit()
-            time.sleep(sleep_s)
+            limiter.acquire()
 
     logger.info("Hub discovery done. hubs_queued=%d", added)
     return added
 
 
-def crawl_queue(reddit, con, logger, sleep_s, deadline_ts):
+def crawl_queue(reddit, con, logger, limiter, seen, deadline_ts):
     done = 0
     errors = 0
     heartbeat_at = time.time()
@@ -431,40 +712,52 @@ def crawl_queue(reddit, con, logger, sleep_s, deadline_ts):
             logger.info("Queue empty. Crawl complete.")
             break
 
+        con.execute("BEGIN IMMEDIATE;")
         for key, url, depth, is_hub, max_comment_depth in batch:
             if deadline_reached(deadline_ts):
                 logger.info("Time budget reached mid-queue batch. Stopping safely.")
+                con.commit()
                 return done, errors
 
             try:
-                sid = submission_id_from_url(url) or (key if re.fullmatch(r"[a-z0-9]{5,8}", key) else None)
+                # Each item runs in its own savepoint so an error discards
+                # only that item's writes — a full-batch rollback would strand
+                # earlier items' Bloom markers ahead of the data they promise.
+                con.execute("SAVEPOINT queue_item;")
+                sid = submission_id_from_url(url) or (key if KEY_RE.fullmatch(key) else None)
                 submission = reddit.submission(id=sid) if sid else reddit.submission(url=url)
 
-                store_submission_and_discover(con, submission, depth=int(depth))
+                store_submission_and_discover(con, submission, depth=int(depth), seen=seen)
 
                 if int(is_hub) == 1 and int(depth) <= MAX_CRAWL_DEPTH:
-                    best_links = extract_reddit_links_from_best_comments(submission, HUB_TOP_LEVEL_COMMENTS, int(max_comment_depth), HUB_MAX_REPLIES_PER_TOP)
+                    best_links = extract_reddit_links_from_best_comments(submission, HUB_TOP_LEVEL_COMMENTS, int(max_comment_depth), HUB_MAX_REPLIES_PER_TOP, limiter=limiter)
                     for nu in best_links:
                         sid2 = submission_id_from_url(nu)
                         qkey = sid2 if sid2 else nu
-                        queue_add(con, key=qkey, url=nu, depth=int(depth) + 1)
+                        queue_add(con, key=qkey, url=nu, depth=int(depth) + 1, seen=seen)
 
                 queue_mark(con, key, "done")
+                con.execute("RELEASE queue_item;")
                 done += 1
-                con.commit()
 
             except Exception as e:
                 errors += 1
-                logger.error("Error processing key=%s url=%s: %s\n%s", key, url, str(e), traceback.format_exc())
+                logger.error("Error processing key=%s url=%s: %s", key, url, e, exc_info=True)
+                con.execute("ROLLBACK TO queue_item;")
+                con.execute("RELEASE queue_item;")
                 queue_mark(con, key, "error", err=str(e)[:500])
                 con.commit()
+                con.execute("BEGIN IMMEDIATE;")
 
             if time.time() - heartbeat_at >= HEARTBEAT_EVERY_SECONDS:
-                qstats = con.execute("SELECT status, COUNT(*) FROM crawl_queue GROUP BY status").fetchall()
-                logger.info("Progress | phase=crawl | done=%d | errors=%d | queue=%s", done, errors, qstats)
+                if logger.isEnabledFor(logging.INFO):
+                    qstats = con.execute("SELECT status, COUNT(*) FROM crawl_queue GROUP BY status").fetchall()
+                    logger.info("Progress | phase=crawl | done=%d | errors=%d | queue=%s", done, errors, qstats)
                 heartbeat_at = time.time()
 
-            time.sleep(sleep_s)
+            limiter.acquire()
+
+        con.commit()
 
     return done, errors
 
@@ -486,10 +779,14 @@ def main():
 
     logger.info("Starting run. sleep=%.2fs recrawl_hubs=%s", args.sleep, args.recrawl_hubs)
 
+    limiter = limiter_from_sleep(args.sleep)
+
     reddit = init_reddit()
     con = init_db()
     apply_schema(con)
 
+    seen = warm_seen_filter(con, logger)
+
     run_id = begin_run(con, notes="DD Library Autopilot (BEST hub comments, time budget)")
     posts_inserted = 0
     hubs_queued = 0
@@ -500,28 +797,30 @@ def main():
         if args.recrawl_hubs:
             queue_reset_hubs(con, logger)
 
-        posts_inserted = ingest_dd_flair_posts(reddit, con, logger, sleep_s=args.sleep, deadline_ts=deadline_ts)
+        posts_inserted = ingest_dd_flair_posts(reddit, con, logger, limiter, seen, deadline_ts=deadline_ts)
         update_run_stats(con, run_id, posts_inserted, hubs_queued, queue_done, errors)
 
         if not deadline_reached(deadline_ts):
-            hubs_queued = discover_hub_posts(reddit, con, logger, sleep_s=args.sleep, deadline_ts=deadline_ts)
+            hubs_queued = discover_hub_posts(reddit, con, logger, limiter, seen, deadline_ts=deadline_ts)
             update_run_stats(con, run_id, posts_inserted, hubs_queued, queue_done, errors)
 
         if not deadline_reached(deadline_ts):
-            queue_done, crawl_errors = crawl_queue(reddit, con, logger, sleep_s=args.sleep, deadline_ts=deadline_ts)
+            queue_done, crawl_errors = crawl_queue(reddit, con, logger, limiter, seen, deadline_ts=deadline_ts)
             errors += crawl_errors
             update_run_stats(con, run_id, posts_inserted, hubs_queued, queue_done, errors)
 
         logger.info("Run end. posts_inserted=%d hubs_queued=%d queue_done=%d errors=%d", posts_inserted, hubs_queued, queue_done, errors)
 
         end_run(con, run_id)
+        con.execute("PRAGMA optimize;")
         con.close()
         return 0
 
     except Exception as e:
-        logger.critical("Fatal error: %s\n%s", str(e), traceback.format_exc())
+        logger.critical("Fatal error: %s", e, exc_info=True)
         update_run_stats(con, run_id, posts_inserted, hubs_queued, queue_done, errors + 1)
         end_run(con, run_id)
+        con.execute("PRAGMA optimize;")
         con.close()
         return 1
 
@@ -23,6 +23,7 @@ def ensure_dir(path: str):
 def connect_db(path: str):
     con = sqlite3.connect(path)
     con.row_factory = sqlite3.Row
+    con.create_function("host", 1, domain_of, deterministic=True)
     return con
 
 
@@ -46,14 +47,18 @@ def fetch_one(con, sql, params=()):
     return dict(row) if row else {}
 
 
-def count_domains(rows):
-    counts = {}
-    for r in rows:
-        d = domain_of(r["url"])
-        counts[d] = counts.get(d, 0) + 1
-    items = [{"domain": k, "count": v} for k, v in counts.items()]
-    items.sort(key=lambda x: x["count"], reverse=True)
-    return items
+DOMAIN_COUNT_SQL = """
+    SELECT host(l.url) AS domain, COUNT(*) AS count
+    FROM links l
+    JOIN posts p ON p.id = l.post_id
+    WHERE p.created_utc >= ? AND p.created_utc < ?
+    GROUP BY host(l.url)
+    ORDER BY count DESC
+"""
+
+
+def epoch(dt: datetime) -> int:
+    return int(dt.timestamp())
 
 
 def compute_deltas(a, b):
@@ -87,32 +92,29 @@ def main():
     totals = fetch_one(con, "SELECT COUNT(*) AS posts_total FROM posts")
     totals_links = fetch_one(con, "SELECT COUNT(*) AS links_total FROM links")
 
-    posts_window = fetch_one(con, "SELECT COUNT(*) AS posts_window FROM posts WHERE created_iso >= ?", (start_iso,))
+    posts_window = fetch_one(con, "SELECT COUNT(*) AS posts_window FROM posts WHERE created_utc >= ?", (epoch(start),))
 
+    # posts_daily is a per-day rollup maintained by the autopilot's insert
+    # trigger, so flair breakdowns cost O(days) instead of O(posts).
     flairs = fetch_all(con, """
-        SELECT COALESCE(link_flair_text,'(none)') AS flair, COUNT(*) AS c
-        FROM posts
-        WHERE created_iso >= ?
-        GROUP BY COALESCE(link_flair_text,'(none)')
+        SELECT flair, SUM(n) AS c
+        FROM posts_daily
+        WHERE day >= ?
+        GROUP BY flair
         ORDER BY c DESC
-    """, (start_iso,))
+    """, (start_iso[:10],))
 
     top_posts = fetch_all(con, """
-        SELECT id, created_iso, title, score, num_comments, permalink, link_flair_text
+        SELECT id, created_utc, title, score, num_comments, permalink, link_flair_text
         FROM posts
-        WHERE created_iso >= ? AND created_iso < ?
+        WHERE created_utc >= ? AND created_utc < ?
         ORDER BY score DESC
         LIMIT ?
-    """, (start_iso, now_iso, args.top_posts))
-
-    domain_rows_window = fetch_all(con, """
-        SELECT l.url AS url
-        FROM links l
-        JOIN posts p ON p.id = l.post_id
-        WHERE p.created_iso >= ? AND p.created_iso < ?
-    """, (start_iso, now_iso))
+    """, (epoch(start), epoch(now), args.top_posts))
+    for r in top_posts:
+        r['created_iso'] = iso(datetime.fromtimestamp(r.pop('created_utc'), tz=timezone.utc))
 
-    top_domains_window = count_domains(domain_rows_window)[: args.top_domains]
+    top_domains_window = fetch_all(con, DOMAIN_COUNT_SQL + " LIMIT ?", (epoch(start), epoch(now), args.top_domains))
 
     diff = None
     if args.diff:
@@ -125,39 +127,37 @@ def main():
         last_start_iso = iso(last_start)
         last_end_iso = iso(last_end)
 
-        this_flairs = fetch_all(con, """
-            SELECT COALESCE(link_flair_text,'(none)') AS flair, COUNT(*) AS c
-            FROM posts
-            WHERE created_iso >= ? AND created_iso < ?
-            GROUP BY COALESCE(link_flair_text,'(none)')
-        """, (this_start_iso, now_iso))
-        last_flairs = fetch_all(con, """
-            SELECT COALESCE(link_flair_text,'(none)') AS flair, COUNT(*) AS c
-            FROM posts
-            WHERE created_iso >= ? AND created_iso < ?
-            GROUP BY COALESCE(link_flair_text,'(none)')
-        """, (last_start_iso, last_end_iso))
-
-        this_map = {r['flair']: r['c'] for r in this_flairs}
-        last_map = {r['flair']: r['c'] for r in last_flairs}
+        bucketed_flairs = fetch_all(con, """
+            WITH w AS (
+              SELECT flair, n,
+                     CASE WHEN day >= ? THEN 'this' ELSE 'last' END AS bucket
+              FROM posts_daily
+              WHERE day >= ? AND day <= ?
+            )
+            SELECT bucket, flair, SUM(n) AS c
+            FROM w
+            GROUP BY bucket, flair
+        """, (this_start_iso[:10], last_start_iso[:10], now_iso[:10]))
+
+        this_map = {r['flair']: r['c'] for r in bucketed_flairs if r['bucket'] == 'this'}
+        last_map = {r['flair']: r['c'] for r in bucketed_flairs if r['bucket'] == 'last'}
         flair_deltas = compute_deltas(this_map, last_map)
 
-        this_dom_rows = fetch_all(con, """
-            SELECT l.url AS url
-            FROM links l
-            JOIN posts p ON p.id = l.post_id
-            WHERE p.created_iso >= ? AND p.created_iso < ?
-        """, (this_start_iso, now_iso))
-
-        last_dom_rows = fetch_all(con, """
-            SELECT l.url AS url
-            FROM links l
-            JOIN posts p ON p.id = l.post_id
-            WHERE p.created_iso >= ? AND p.created_iso < ?
-        """, (last_start_iso, last_end_iso))
-
-        this_dom = {d['domain']: d['count'] for d in count_domains(this_dom_rows)}
-        last_dom = {d['domain']: d['count'] for d in count_domains(last_dom_rows)}
+        bucketed_domains = fetch_all(con, """
+            WITH w AS (
+              SELECT host(l.url) AS domain,
+                     CASE WHEN p.created_utc >= ? THEN 'this' ELSE 'last' END AS bucket
+              FROM links l
+              JOIN posts p ON p.id = l.post_id
+              WHERE p.created_utc >= ? AND p.created_utc < ?
+            )
+            SELECT bucket, domain, COUNT(*) AS count
+            FROM w
+            GROUP BY bucket, domain
+        """, (epoch(this_start), epoch(last_start), epoch(now)))
+
+        this_dom = {r['domain']: r['count'] for r in bucketed_domains if r['bucket'] == 'this'}
+        last_dom = {r['domain']: r['count'] for r in bucketed_domains if r['bucket'] == 'last'}
         dom_deltas = compute_deltas(this_dom, last_dom)[: max(50, args.top_domains)]
 
         diff = {
@@ -226,6 +226,7 @@ Window: last **{args.days}** days (since `{start_iso}`)
     print(' -', md_path)
     print(' -', json_path)
 
+    con.execute("PRAGMA optimize;")
     con.close()
 
 
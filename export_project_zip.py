@@ -1,17 +1,20 @@
 import os
+import shutil
 import zipfile
 import argparse
 from datetime import datetime
 
-EXCLUDES = {'.env', '.venv', '__pycache__', '.git', 'exports'}
+EXCLUDES = {'.env', '.venv', '__pycache__', '.git', 'exports', 'logs'}
+EXCLUDE_SUFFIXES = ('.pyc', '.pyo', '.sqlite', '.sqlite-wal', '.sqlite-shm')
+
+COMPRESS_LEVEL = 6
+STREAM_THRESHOLD = 10 * 1024 * 1024
+STREAM_CHUNK = 1 << 20
 
 def should_skip(rel_path: str):
-    parts = rel_path.replace('\\', '/').split('/')
-    if any(p in EXCLUDES for p in parts):
-        return True
-    if rel_path.lower().endswith(('.pyc', '.pyo')):
-        return True
-    return False
+    # os.walk pruning (below) already keeps excluded directories out of the
+    # tree, so only the entry's own name needs checking — no path split.
+    return rel_path.lower().endswith(EXCLUDE_SUFFIXES) or os.path.basename(rel_path) in EXCLUDES
 
 
 def main():
@@ -28,27 +31,26 @@ def main():
     ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
     outpath = os.path.join(outdir, f'{args.name}_{ts}.zip')
 
-    with zipfile.ZipFile(outpath, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+    with zipfile.ZipFile(outpath, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
         for base, dirs, files in os.walk(root):
             rel_base = os.path.relpath(base, root)
             if rel_base == '.':
                 rel_base = ''
 
-            keep = []
-            for d in dirs:
-                rel_d = os.path.join(rel_base, d) if rel_base else d
-                if should_skip(rel_d):
-                    continue
-                keep.append(d)
-            dirs[:] = keep
+            dirs[:] = [d for d in dirs if d not in EXCLUDES]
 
             for f in files:
-                if f == '.env':
-                    continue
                 rel_f = os.path.join(rel_base, f) if rel_base else f
                 if should_skip(rel_f):
                     continue
-                zf.write(os.path.join(base, f), rel_f)
+                src_path = os.path.join(base, f)
+                if os.path.getsize(src_path) > STREAM_THRESHOLD:
+                    info = zipfile.ZipInfo.from_file(src_path, rel_f)
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    with open(src_path, 'rb') as src, zf.open(info, 'w', force_zip64=True) as dst:
+                        shutil.copyfileobj(src, dst, STREAM_CHUNK)
+                else:
+                    zf.write(src_path, rel_f)
 
     print('ZIP created:')
     print(' -', outpath)